@@ -1,9 +1,10 @@
 # NAP.py - Streamlit app that uses Apps Script web app for reads/writes
 import streamlit as st
-import pandas as pd
-import uuid
-import requests
+import math
+import secrets
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait
+from itertools import zip_longest
 
 # -----------------------
 # Config / secrets
@@ -15,6 +16,16 @@ APP_SCRIPT_PASSWORD = st.secrets.get("APP_SCRIPT_PASSWORD", None)
 ADMIN_PASSWORD = st.secrets.get("ADMIN_PASSWORD", None)
 SHEET_TAB = st.secrets.get("SHEET_TAB_NAME", "Violations")
 
+# Sheet row number of the first data row (row 1 holds the header)
+FIRST_DATA_ROW = 2
+
+# Rows shown per page in the logs table
+PAGE_SIZE = 100
+
+# Concurrent single-row updates when the script has no update_many;
+# must stay within the session's connection pool (pool_maxsize)
+UPDATE_WORKERS = 8
+
 # Basic checks for required secrets
 missing = []
 if not APP_SCRIPT_URL:
@@ -33,189 +44,322 @@ if missing:
     )
     st.stop()
 
+# -----------------------
+# Simple auth (Streamlit-level)
+# -----------------------
+if "logged_in" not in st.session_state:
+    st.session_state.logged_in = False
+
+if not st.session_state.logged_in:
+    st.title("🔒 NAP Logger — login")
+    pw = st.text_input("Admin password", type="password")
+    if st.button("Log in"):
+        if pw == ADMIN_PASSWORD:
+            st.session_state.logged_in = True
+            st.rerun()
+        else:
+            st.error("Wrong password")
+    st.stop()
+
 # -----------------------
 # Helpers (Apps Script integration)
 # -----------------------
-def read_sheet_as_df():
+# Imported only after the login gate so the login page never loads them
+import pandas as pd
+import numpy as np
+import orjson
+
+@st.cache_resource
+def get_requests_session():
+    """
+    Shared requests.Session for Apps Script calls, created once per process
+    so connections are reused across calls and reruns. requests is imported
+    here so reruns that never reach the sheet (e.g. the login page) skip it.
+    """
+    import requests
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.retry import Retry
+
+    # Back off and retry when Apps Script is rate limited or briefly
+    # unavailable. Those replies mean the request was not processed, so even
+    # POSTs are safe to resend; read errors are not retried for that reason.
+    retry = Retry(
+        total=5,
+        read=0,
+        backoff_factor=0.5,
+        status_forcelist=(429, 503),
+        allowed_methods=None,
+        raise_on_status=False
+    )
+    session = requests.Session()
+    # request bodies are sent pre-encoded with orjson
+    session.headers.update({"Content-Type": "application/json"})
+    # keep-alive pool sized for UPDATE_WORKERS concurrent row updates
+    session.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=2 * UPDATE_WORKERS, max_retries=retry))
+    return session
+
+@st.cache_resource
+def get_unsupported_actions():
+    """
+    Optional Apps Script actions (update_many, add_many, version) the deployed
+    script does not support. Shared across sessions so later calls go straight
+    to the fallback instead of spending a request that is bound to fail.
+    """
+    return set()
+
+@st.cache_resource
+def get_sheet_snapshot():
+    """
+    Last sheet DataFrame read from Apps Script and the version it was read at,
+    kept as a single "entry" (version, df) so a concurrent clear can never
+    leave one without the other. Lets fetch_sheet_df skip the full read when
+    the sheet has not changed.
+    """
+    return {}
+
+def get_from_script(params=None):
+    """
+    GET the Apps Script doGet endpoint and return the decoded JSON reply.
+    Raises if the reply is not ok.
+    """
+    resp = get_requests_session().get(APP_SCRIPT_URL, params=params, timeout=10)
+    resp.raise_for_status()
+    # orjson decodes the raw bytes directly and is much faster on large sheets
+    j = orjson.loads(resp.content)
+    if not j.get("ok", False):
+        raise Exception(f"Apps Script error: {j.get('error')}")
+    return j
+
+@st.cache_data(ttl=60, show_spinner=False)
+def fetch_sheet_df():
     """
     Read sheet data from the Apps Script doGet endpoint.
     Endpoint returns JSON: { ok: true, data: [ [header...], [row1...], ... ] }
+    Cached for 60s across reruns; raises on failure so errors are never cached.
+    Call clear_sheet_cache() after writing to the sheet.
+
+    If the script supports action=version ({ ok: true, version: "...", rows: N }),
+    the version is checked first and the full read is skipped when it matches
+    the last snapshot, much like a conditional GET with an ETag, or when the
+    optional row count shows the sheet holds no more than its header.
+    """
+    snapshot = get_sheet_snapshot()
+    unsupported = get_unsupported_actions()
+    version = None
+    if "version" not in unsupported:
+        try:
+            probe = get_from_script({"action": "version"})
+        except Exception as e:
+            # Only an explicit "unknown action" reply means the script lacks the
+            # action; timeouts and server errors just skip the probe this time
+            if "unknown action" in str(e).lower():
+                unsupported.add("version")
+        else:
+            version = probe.get("version")
+            # read the entry once; another session may clear the snapshot meanwhile
+            entry = snapshot.get("entry")
+            if version is None:
+                # older doGet ignores the action and returns the full sheet
+                unsupported.add("version")
+            elif entry is not None and version == entry[0]:
+                # hand out a copy; callers may modify the frame they get back
+                return entry[1].copy()
+            elif isinstance(probe.get("rows"), int) and probe["rows"] <= 1:
+                # header only: nothing worth downloading
+                return pd.DataFrame()
+
+    data = get_from_script().get("data", [])
+    if not data or len(data) < 1:
+        return pd.DataFrame()
+    headers = [str(h) for h in data[0]]
+    rows = data[1:]
+    # normalize lengths: transpose into columns, padding short rows with ""
+    columns = list(zip_longest(*rows, fillvalue=""))
+    max_len = max(len(headers), len(columns))
+    headers = headers + [f"col_{i}" for i in range(len(headers)+1, max_len+1)]
+    columns += [("",) * len(rows)] * (max_len - len(columns))
+    df = pd.DataFrame(dict(enumerate(columns)))
+    df.columns = headers
+    if version is not None:
+        snapshot["entry"] = (version, df.copy())
+    return df
+
+def clear_sheet_cache(pending_read=None):
+    """
+    Drop the cached sheet and its version snapshot after a write, so the next
+    read always fetches the sheet again. If a background fetch_sheet_df call
+    is still running, wait for it first so it cannot re-cache the old data.
+    """
+    if pending_read is not None:
+        wait([pending_read])
+    get_sheet_snapshot().clear()
+    fetch_sheet_df.clear()
+
+@st.cache_resource
+def get_background_executor():
+    """
+    Small shared thread pool for starting the sheet read in the background.
+    """
+    return ThreadPoolExecutor(max_workers=4)
+
+def read_sheet_as_df(future=None):
+    """
+    Return the sheet as a DataFrame, showing an error and returning an empty
+    DataFrame if it cannot be read. If future is given (a fetch_sheet_df call
+    started on get_background_executor), wait for its result instead.
     """
     try:
-        resp = requests.get(APP_SCRIPT_URL, timeout=10)
-        resp.raise_for_status()
-        j = resp.json()
-        if not j.get("ok", False):
-            st.error(f"Apps Script error: {j.get('error')}")
-            return pd.DataFrame()
-        data = j.get("data", [])
-        if not data or len(data) < 1:
-            return pd.DataFrame()
-        headers = [str(h) for h in data[0]]
-        rows = data[1:]
-        # normalize lengths
-        max_len = max(len(headers), max((len(r) for r in rows), default=0))
-        headers = headers + [f"col_{i}" for i in range(len(headers)+1, max_len+1)]
-        normalized = []
-        for r in rows:
-            if len(r) < max_len:
-                normalized.append(r + [""] * (max_len - len(r)))
-            else:
-                normalized.append(r[:max_len])
-        df = pd.DataFrame(normalized, columns=headers)
-        return df
+        if future is not None:
+            return future.result()
+        return fetch_sheet_df()
     except Exception as e:
         st.error(f"Failed to read from Apps Script: {e}")
         return pd.DataFrame()
 
+def post_to_script(payload, timeout=10):
+    """
+    POST payload to the Apps Script doPost endpoint and return the JSON reply.
+    """
+    # orjson serializes straight to bytes, much faster than json= on large batches
+    resp = get_requests_session().post(APP_SCRIPT_URL, data=orjson.dumps(payload), timeout=timeout)
+    resp.raise_for_status()
+    # check the raw bytes; resp.text would decode the whole body just to test it
+    return orjson.loads(resp.content) if resp.content else {}
+
+def post_batch_to_script(payload):
+    """
+    POST a batch action (update_many, add_many) to Apps Script.
+    Returns True if it was applied, or False if the deployment does not
+    support the action (remembered in get_unsupported_actions). Raises on
+    any other Apps Script error.
+    """
+    action = payload["action"]
+    unsupported = get_unsupported_actions()
+    if action in unsupported:
+        return False
+    j = post_to_script(payload, timeout=30)
+    if j.get("ok", False):
+        return True
+    if "unknown action" in str(j.get("error", "")).lower():
+        unsupported.add(action)
+        return False
+    raise Exception(f"Apps Script error ({action}): {j}")
+
+# Field names the Apps Script add actions expect, in row_list order
+ADD_FIELDS = ("uid", "timestamp", "reporter", "violator", "category", "description", "coords", "proofs")
+
+def add_fields(row_list):
+    """
+    Map row_list [uid, timestamp, reporter, violator, category, description, coords, proofs]
+    to the field names the Apps Script add actions expect; missing values become "".
+    """
+    return dict(zip_longest(ADD_FIELDS, row_list[:len(ADD_FIELDS)], fillvalue=""))
+
 def append_row_via_script(row_list):
     """
     row_list expected: [uid, timestamp, reporter, violator, category, description, coords, proofs]
     Posts to Apps Script with action=add.
     """
+    payload = {"password": APP_SCRIPT_PASSWORD, "action": "add"}
+    payload.update(add_fields(row_list))
+    j = post_to_script(payload)
+    if not j.get("ok", False):
+        raise Exception(f"Apps Script error (add): {j}")
+
+def append_rows_via_script(rows):
+    """
+    Append several rows in a single Apps Script call (action=add_many).
+    rows is a list of row_lists as taken by append_row_via_script. Rows are
+    removed from the list once the script confirms them, so after an error
+    it holds the rows not confirmed as written. That is not always the rows
+    still missing: if a request times out or drops after the script has
+    appended, those rows stay in the list and sending them again adds them
+    twice. If the endpoint does not know add_many, falls back to one
+    append_row_via_script call per row, in order.
+    """
     payload = {
         "password": APP_SCRIPT_PASSWORD,
-        "action": "add",
-        "uid": row_list[0] if len(row_list) > 0 else "",
-        "timestamp": row_list[1] if len(row_list) > 1 else "",
-        "reporter": row_list[2] if len(row_list) > 2 else "",
-        "violator": row_list[3] if len(row_list) > 3 else "",
-        "category": row_list[4] if len(row_list) > 4 else "",
-        "description": row_list[5] if len(row_list) > 5 else "",
-        "coords": row_list[6] if len(row_list) > 6 else "",
-        "proofs": row_list[7] if len(row_list) > 7 else ""
+        "action": "add_many",
+        "rows": [add_fields(row_list) for row_list in rows]
     }
-    resp = requests.post(APP_SCRIPT_URL, json=payload, timeout=10)
-    resp.raise_for_status()
-    j = resp.json() if resp.text else {}
-    if not j.get("ok", False):
-        raise Exception(f"Apps Script error (add): {j}")
+    if post_batch_to_script(payload):
+        rows.clear()
+        return
+
+    # Older Apps Script deployments only support single-row adds
+    while rows:
+        append_row_via_script(rows[0])
+        rows.pop(0)
+
+def payload_fields(data_dict):
+    """
+    Keep only JSON-friendly values from data_dict. Strings and numbers are
+    sent as-is so numeric cells travel as JSON numbers; None and NaN
+    (cleared cells) become "".
+    """
+    fields = {}
+    for k, v in data_dict.items():
+        if v is None or (isinstance(v, float) and math.isnan(v)):
+            fields[k] = ""
+        elif isinstance(v, (str, int, float)):
+            fields[k] = v
+    return fields
 
 def update_row_via_script(uid, data_dict):
     """
     Update a row by uid via Apps Script. data_dict maps column_name->value.
+    Only the columns present in data_dict are written; Apps Script leaves
+    every other cell of the row unchanged, so callers send just the edits.
     """
     payload = {"password": APP_SCRIPT_PASSWORD, "action": "update", "uid": uid}
-    # include stringifiable values
-    for k, v in data_dict.items():
-        if isinstance(v, (str, int, float)) or v is None:
-            payload[k] = "" if v is None else str(v)
-    resp = requests.post(APP_SCRIPT_URL, json=payload, timeout=10)
-    resp.raise_for_status()
-    j = resp.json() if resp.text else {}
+    payload.update(payload_fields(data_dict))
+    j = post_to_script(payload)
     if not j.get("ok", False):
         raise Exception(f"Apps Script error (update): {j}")
 
-# -----------------------
-# Simple auth (Streamlit-level)
-# -----------------------
-if "logged_in" not in st.session_state:
-    st.session_state.logged_in = False
+def update_rows_via_script(updates):
+    """
+    Update many rows in a single Apps Script call (action=update_many).
+    updates is a list of (uid, data_dict) pairs; as with update_row_via_script,
+    data_dict only needs the changed columns. If the endpoint does not know
+    update_many, falls back to concurrent update_row_via_script calls per row.
+    Returns a list of error messages for rows that failed in the fallback.
+    """
+    payload = {
+        "password": APP_SCRIPT_PASSWORD,
+        "action": "update_many",
+        "rows": [dict(payload_fields(data_dict), uid=uid) for uid, data_dict in updates]
+    }
+    if post_batch_to_script(payload):
+        return []
 
-if not st.session_state.logged_in:
-    st.title("🔒 NAP Logger — login")
-    pw = st.text_input("Admin password", type="password")
-    if st.button("Log in"):
-        if pw == ADMIN_PASSWORD:
-            st.session_state.logged_in = True
-            st.rerun()
-        else:
-            st.error("Wrong password")
-    st.stop()
+    # Older Apps Script deployments only support single-row updates;
+    # send those concurrently over the shared session
+    errors = []
+    progress = st.progress(0.0, text="Updating rows one by one...")
+    with ThreadPoolExecutor(max_workers=UPDATE_WORKERS) as ex:
+        futures = {
+            ex.submit(update_row_via_script, uid, data_dict): uid
+            for uid, data_dict in updates
+        }
+        for done, future in enumerate(as_completed(futures), start=1):
+            try:
+                future.result()
+            except Exception as e:
+                errors.append(f"uid={futures[future]} update failed: {e}")
+            progress.progress(done / len(futures))
+    progress.empty()
+    return errors
 
 # -----------------------
 # Main UI
 # -----------------------
 st.title("📋 NAP Violation Logs (Google Sheets via Apps Script)")
 
-# Load data
-df = read_sheet_as_df()
-
-# --- Editable table with multi-line description ---
-if not df.empty:
-    st.subheader("Existing logs — edit then press Save changes")
-
-    # Insert sheet_row index (sheet rows start at 2 because header is row 1)
-    df_display = df.copy()
-    df_display.insert(0, "sheet_row", [i + 2 for i in range(len(df_display))])
-
-    # Configure column behavior: make 'description' a multiline text editor and 'proof_link' wide
-    column_cfg = {}
-    if "description" in df_display.columns:
-        column_cfg["description"] = st.column_config.TextColumn(
-            "description",
-            help="Detailed description of the incident",
-            width="wide",
-            max_chars=2000
-        )
-    if "proof_link" in df_display.columns:
-        column_cfg["proof_link"] = st.column_config.TextColumn(
-            "proof_link",
-            help="Comma-separated proof URLs",
-            width="large",
-            max_chars=2000
-        )
-
-    # Show editable data editor
-    edited = st.data_editor(
-        df_display,
-        num_rows="dynamic",
-        use_container_width=True,
-        column_config=column_cfg,
-        hide_index=True,
-        key="nap_logs_editor"
-    )
-
-    # Save button: write back any changes to the sheet
-    if st.button("Save changes"):
-        header_vals = list(df.columns)
-        updated_count = 0
-        errors = []
-
-        for _, row in edited.iterrows():
-            try:
-                sheet_row = int(row["sheet_row"])
-            except Exception:
-                # skip rows without sheet_row
-                continue
-
-            # Build values in the same order as header_vals
-            row_values = [row.get(col, "") for col in header_vals]
-
-            # Try to obtain uid for update. Prefer edited 'uid' column if present,
-            # else use original df to fetch the uid from that sheet_row.
-            uid_val = None
-            if "uid" in row.index and row.get("uid"):
-                uid_val = row.get("uid")
-            else:
-                try:
-                    orig_idx = sheet_row - 2
-                    if 0 <= orig_idx < len(df):
-                        if "uid" in df.columns:
-                            uid_val = df.iloc[orig_idx].get("uid", "")
-                except Exception:
-                    uid_val = None
-
-            if uid_val:
-                # build data dict mapping header->value
-                data_dict = {}
-                for col in header_vals:
-                    data_dict[col] = row.get(col, "")
-                # attempt update via Apps Script
-                try:
-                    update_row_via_script(uid_val, data_dict)
-                    updated_count += 1
-                except Exception as e:
-                    errors.append(f"Row {sheet_row} (uid={uid_val}) update failed: {e}")
-            else:
-                errors.append(f"Row {sheet_row} skipped: uid not found.")
-
-        if errors:
-            for e in errors:
-                st.error(e)
-        st.success(f"Saved updates to {updated_count} row(s).")
-else:
-    st.info("No logs found. Make sure your sheet has a header row and data.")
+# Start loading the sheet in the background; the add form below renders
+# while it loads and the table is filled into this placeholder afterwards
+sheet_future = get_background_executor().submit(fetch_sheet_df)
+table_area = st.container()
 
 # Add new report form
 st.subheader("➕ Add new report")
@@ -231,19 +375,212 @@ with st.form("add_form"):
         coords = st.text_input("Coordinates", placeholder="X:123 Y:456")
     description = st.text_area("Description", height=120)
     proof_links = st.text_input("Proof links (optional, comma separated) — paste image URLs or drive links")
-    submitted = st.form_submit_button("Add report")
+    b1, b2 = st.columns(2)
+    with b1:
+        submitted = st.form_submit_button("Add report")
+    with b2:
+        queued = st.form_submit_button("Queue report")
 
-if submitted:
+# Reports queued in this session, written together with one request
+if "pending_rows" not in st.session_state:
+    st.session_state.pending_rows = []
+
+if submitted or queued:
     if not reporter.strip() or not description.strip():
         st.error("Reporter and description required.")
     else:
-        uid = uuid.uuid4().hex[:10]
+        uid = secrets.token_hex(5)
         timestamp = datetime.combine(date_val, time_val).isoformat()
         links = proof_links.strip()
         row = [uid, timestamp, reporter, violator, category, description, coords, links]
+        if queued:
+            st.session_state.pending_rows.append(row)
+            st.success("Report queued.")
+        else:
+            try:
+                append_row_via_script(row)
+                clear_sheet_cache(sheet_future)
+                st.success("Report added to sheet.")
+                st.rerun()
+            except Exception as e:
+                st.error(f"Failed to add report: {e}")
+
+if st.session_state.pending_rows:
+    st.info(
+        f"{len(st.session_state.pending_rows)} queued report(s) not yet in the sheet. "
+        "They are kept only for this session."
+    )
+    if st.button("Submit queued reports"):
         try:
-            append_row_via_script(row)
-            st.success("Report added to sheet.")
+            append_rows_via_script(st.session_state.pending_rows)
+            clear_sheet_cache(sheet_future)
+            st.success("Queued reports added to sheet.")
             st.rerun()
         except Exception as e:
-            st.error(f"Failed to add report: {e}")
+            clear_sheet_cache(sheet_future)
+            st.error(
+                f"Failed to add queued reports: {e}. Some of them may already be in "
+                "the sheet; check the table before submitting again."
+            )
+
+# Load data into the placeholder above the add form
+with table_area:
+    df = read_sheet_as_df(sheet_future)
+
+    # --- Editable table with multi-line description ---
+    if not df.empty:
+        st.subheader("Existing logs — edit then press Save changes")
+
+        header_vals = list(df.columns)
+
+        # Insert sheet_row index (sheet rows start at FIRST_DATA_ROW because header is row 1).
+        # fetch_sheet_df returns a fresh frame on every call, so insert in place
+        # rather than copying it; the save loop only compares header_vals columns.
+        df.insert(0, "sheet_row", np.arange(FIRST_DATA_ROW, len(df) + FIRST_DATA_ROW))
+        df_display = df
+
+        # Configure column behavior: make 'description' a multiline text editor and 'proof_link' wide
+        column_cfg = {}
+        if "description" in df_display.columns:
+            column_cfg["description"] = st.column_config.TextColumn(
+                "description",
+                help="Detailed description of the incident",
+                width="wide",
+                max_chars=2000
+            )
+        if "uid" in df_display.columns:
+            # rows are saved by uid, so it cannot be changed from the table
+            column_cfg["uid"] = st.column_config.TextColumn("uid", disabled=True)
+        if "proof_link" in df_display.columns:
+            column_cfg["proof_link"] = st.column_config.TextColumn(
+                "proof_link",
+                help="Comma-separated proof URLs",
+                width="large",
+                max_chars=2000
+            )
+
+        # Only send one page of rows to the browser at a time
+        page_count = max(1, math.ceil(len(df_display) / PAGE_SIZE))
+        page = 1
+        if page_count > 1:
+            # keyed, with a fixed label, so the selected page survives the
+            # page count changing when the sheet grows or shrinks
+            page = int(st.number_input(
+                "Page",
+                min_value=1,
+                max_value=page_count,
+                value=1,
+                step=1,
+                key="nap_logs_page",
+                help=f"{page_count} pages of {PAGE_SIZE} rows. Edits on other pages are kept until you save."
+            ))
+        page_start = (page - 1) * PAGE_SIZE
+
+        # Unsaved edits from every page, as {sheet_row: {column: value}}. The
+        # editor only keeps the edits of the page it shows, so they are copied
+        # here to survive switching pages. Cells that now match the sheet
+        # (saved, or edited back) are dropped.
+        pending_edits = st.session_state.setdefault("nap_logs_edits", {})
+        for sheet_row in list(pending_edits):
+            pos = sheet_row - FIRST_DATA_ROW
+            changes = pending_edits[sheet_row]
+            if pos < len(df):
+                orig_row = df.iloc[pos]
+                for col in list(changes):
+                    if str(changes[col]) == str(orig_row.get(col, "")):
+                        del changes[col]
+            if pos >= len(df) or not changes:
+                del pending_edits[sheet_row]
+
+        # Show this page with its pending edits applied
+        page_df = df_display.iloc[page_start:page_start + PAGE_SIZE]
+        page_rows = [r for r in page_df["sheet_row"] if r in pending_edits]
+        if page_rows:
+            page_df = page_df.copy()
+            for sheet_row in page_rows:
+                for col, val in pending_edits[sheet_row].items():
+                    page_df.at[sheet_row - FIRST_DATA_ROW, col] = val
+
+        # one editor state per page, so edit positions always refer to this page;
+        # the generation changes after a save to start from a clean editor
+        editor_gen = st.session_state.get("nap_logs_editor_gen", 0)
+        editor_key = f"nap_logs_editor_{page}_{editor_gen}"
+
+        # Show editable data editor
+        st.data_editor(
+            page_df,
+            # only cell edits are saved, so rows cannot be added or deleted here
+            num_rows="fixed",
+            use_container_width=True,
+            column_config=column_cfg,
+            hide_index=True,
+            key=editor_key
+        )
+
+        # The editor's session state holds only the cells the user touched:
+        # {"edited_rows": {position: {column: value}}, ...}
+        # Positions are relative to the current page.
+        delta = st.session_state.get(editor_key, {})
+        for pos, changes in delta.get("edited_rows", {}).items():
+            sheet_row = int(page_df["sheet_row"].iat[int(pos)])
+            pending_edits.setdefault(sheet_row, {}).update(changes)
+        if pending_edits:
+            st.caption(f"{len(pending_edits)} row(s) with unsaved edits.")
+
+        # Save button: write back any changes to the sheet
+        if st.button("Save changes"):
+            updated_count = 0
+            errors = []
+
+            updates = []
+
+            # Save the pending edits of every page, not just the one shown
+            edited_rows = {
+                sheet_row - FIRST_DATA_ROW: changes
+                for sheet_row, changes in pending_edits.items()
+            }
+            positions = sorted(pos for pos in edited_rows if pos < len(df))
+            # original values of just the edited rows, as plain dicts
+            orig_rows = df.iloc[positions].to_dict("records")
+
+            for pos, orig_row in zip(positions, orig_rows):
+                sheet_row = orig_row["sheet_row"]
+
+                # Only send sheet cells whose value really changed (an edit may have been undone)
+                # ('uid' is the row's key, not a value the update can change)
+                data_dict = {
+                    col: val for col, val in edited_rows[pos].items()
+                    if col in header_vals and col != "uid" and str(val) != str(orig_row.get(col, ""))
+                }
+                if not data_dict:
+                    continue
+
+                # Always address the row by its original uid
+                uid_val = orig_row.get("uid", "")
+
+                if uid_val:
+                    updates.append((uid_val, data_dict))
+                else:
+                    errors.append(f"Row {sheet_row} skipped: uid not found.")
+
+            # send all row updates to Apps Script in one request
+            if updates:
+                try:
+                    failed = update_rows_via_script(updates)
+                    errors.extend(failed)
+                    updated_count = len(updates) - len(failed)
+                except Exception as e:
+                    errors.append(f"Update of {len(updates)} row(s) failed: {e}")
+                # drop the cached sheet so the next rerun shows the saved values
+                clear_sheet_cache(sheet_future)
+
+            if errors:
+                for e in errors:
+                    st.error(e)
+            else:
+                # everything was written; start the next round of edits afresh
+                pending_edits.clear()
+                st.session_state.nap_logs_editor_gen = editor_gen + 1
+            st.success(f"Saved updates to {updated_count} row(s).")
+    else:
+        st.info("No logs found. Make sure your sheet has a header row and data.")